@@ -0,0 +1,48 @@
+import time
+
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_cache_key(user_id) -> str:
+    return f'user:{user_id}'
+
+
+def _without_password(user):
+    # The cached copy leaves the password hash out of the cache. Django treats
+    # it as a deferred field and loads it from the database if it is read.
+    # pylint: disable=protected-access
+    field_names = [
+        field.attname
+        for field in user._meta.concrete_fields
+        if field.attname != 'password'
+    ]
+    return type(user).from_db(user._state.db, field_names,
+                              [getattr(user, name) for name in field_names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # The user is cached per user id until the access token expires. The
+    # authentication signals drop the entry whenever the user is saved or
+    # deleted, so deactivating a user takes effect on the next request.
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        expires_at = validated_token.get('exp')
+        # The revocation check compares each token with the password hash,
+        # which the cached user does not carry. simplejwt releases before 5.3
+        # have no such setting.
+        if (user_id is None or expires_at is None or
+                getattr(api_settings, 'CHECK_REVOKE_TOKEN', False)):
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            timeout = int(expires_at - time.time())
+            if timeout > 0:
+                cache.set(key, _without_password(user), timeout=timeout)
+
+        return user
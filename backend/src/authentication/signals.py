@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from authentication.authentication import user_cache_key
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    key = user_cache_key(getattr(instance, api_settings.USER_ID_FIELD))
+    # Deleted after the commit, so a concurrent request cannot cache the old
+    # row again in between.
+    transaction.on_commit(lambda: cache.delete(key))
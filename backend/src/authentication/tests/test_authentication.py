@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.authentication import user_cache_key
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice',
+                                             password='secret')
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_user_is_cached_without_password(self):
+        response = self.client.get('/api/auth/me/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'username': 'alice'})
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(cached.username, 'alice')
+        self.assertIn('password', cached.get_deferred_fields())
+
+    def test_cached_user_skips_the_database(self):
+        self.client.get('/api/auth/me/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/me/')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/auth/me/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get('/api/auth/me/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 401)
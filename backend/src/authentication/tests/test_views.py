@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+
+class RegisterViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_register(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'alice',
+            'password': 'secret'
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            User.objects.get(username='alice').check_password('secret'))
+
+    def test_duplicate_username(self):
+        User.objects.create_user(username='alice', password='secret')
+
+        response = self.client.post('/api/auth/register/', {
+            'username': 'alice',
+            'password': 'other'
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Username already exists'})
+        # The test runs inside a transaction, which must still be usable.
+        self.assertEqual(User.objects.count(), 1)
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
 from rest_framework import decorators, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -15,9 +16,14 @@ class RegisterView(generics.CreateAPIView):
         password = request.data.get('password')
         if not username or not password:
             return Response({'error': 'Missing fields'}, status=400)
-        if User.objects.filter(username=username).exists():
+        try:
+            # Relies on the unique constraint on User.username instead of a
+            # separate existence query. The savepoint keeps an enclosing
+            # transaction usable after the IntegrityError.
+            with transaction.atomic():
+                User.objects.create_user(username=username, password=password)
+        except IntegrityError:
             return Response({'error': 'Username already exists'}, status=400)
-        User.objects.create_user(username=username, password=password)
         return Response({'message': 'User created successfully'}, status=201)
 
 
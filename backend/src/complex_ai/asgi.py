@@ -1,15 +1,35 @@
 import os
-import src.complex_ai.routing
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.complex_ai.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'complex_ai.settings')
+
+# Set up Django before importing anything that touches models or apps.
+django_asgi_app = get_asgi_application()
+
+# pylint: disable=wrong-import-position
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ProtocolTypeRouter, URLRouter
+
+from complex_ai import routing
+from markets.services import aclose_http_client
+
+
+async def lifespan(_scope, receive, send):
+    # Django's ASGI handler ignores lifespan events, so shared async clients
+    # are closed here when the server shuts down.
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aclose_http_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
 
 application = ProtocolTypeRouter({
-    "http":
-        get_asgi_application(),
-    "websocket":
-        AuthMiddlewareStack(
-            URLRouter(src.complex_ai.routing.websocket_urlpatterns))
+    "http": django_asgi_app,
+    'lifespan': lifespan,
+    "websocket": AuthMiddlewareStack(URLRouter(routing.websocket_urlpatterns))
 })
@@ -1,18 +1,21 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+# Serialized once at import instead of on every connect. Kept as text, the
+# frontend parses event.data as a JSON string.
+# Example: Send stock + recommendation when client connects
+_HELLO = json.dumps({
+    "symbol": "AAPL",
+    "price": 185.42,
+    "recommend": True  # from LLM later
+})
+
 
 class StockConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         await self.accept()
-        # Example: Send stock + recommendation when client connects
-        data = {
-            "symbol": "AAPL",
-            "price": 185.42,
-            "recommend": True  # from LLM later
-        }
-        await self.send(json.dumps(data))
+        await self.send(text_data=_HELLO)
 
     async def disconnect(self, close_code):
         print("WebSocket disconnected")
@@ -0,0 +1,22 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Types orjson has no native support for (Decimal, lazy translation strings,
+# generators, sets, ...) go through DRF's own encoder instead of failing.
+_DEFAULT = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_SERIALIZE_NUMPY
+        # orjson only supports a two space indent, any requested indent
+        # pretty prints with it.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=_DEFAULT, option=option)
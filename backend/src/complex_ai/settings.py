@@ -23,7 +23,7 @@ INSTALLED_APPS = [
     'markets',
 ]
 
-ASGI_APPLICATION = 'src.complex_ai.asgi.application'
+ASGI_APPLICATION = 'complex_ai.asgi.application'
 
 CHANNEL_LAYERS = {
     "default": {
@@ -33,6 +33,7 @@ CHANNEL_LAYERS = {
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,7 +63,11 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':
-        ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+        ('authentication.authentication.CachedJWTAuthentication',),
+    'DEFAULT_RENDERER_CLASSES': (
+        'complex_ai.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -73,13 +78,55 @@ SIMPLE_JWT = {
 
 STATIC_URL = 'static/'
 
-DATABASES = {
+if os.environ.get('POSTGRES_DB'):
+    # Production connects through pgbouncer in transaction pooling mode, so
+    # server-side cursors must stay disabled. pgbouncer also does the
+    # connection pooling: persistent connections are not safe under ASGI,
+    # where Django opens a connection per async request.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'pgbouncer'),
+            'PORT': int(os.environ.get('POSTGRES_PORT', '6432')),
+            'CONN_MAX_AGE': 0,
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+            'OPTIONS': {
+                'sslmode': os.environ.get('POSTGRES_SSLMODE', 'require'),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Treat an unreachable Redis as a cache miss instead of failing
+            # the request.
+            'IGNORE_EXCEPTIONS': True,
+        },
     }
 }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Serve live prices from the async view, which fetches quotes with httpx on
+# the event loop. Set to False to fall back to the synchronous view.
+ASYNC_LIVE_PRICES = os.environ.get('ASYNC_LIVE_PRICES', '1') == '1'
+
 SUPPORTED_STOCKS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META']
+
+# Models loaded in a background thread at startup, the rest are loaded on
+# first use.
+PRELOADED_STOCKS = []
@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+import numpy as np
+import orjson
+
+from complex_ai.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def setUp(self):
+        self.renderer = ORJSONRenderer()
+
+    def test_types_orjson_does_not_support(self):
+        data = {
+            'price': Decimal('1.50'),
+            'label': gettext_lazy('Price'),
+            'symbols': (s for s in ['AAPL']),
+            'score': np.float32(0.5),
+        }
+
+        rendered = orjson.loads(self.renderer.render(data))
+
+        self.assertEqual(rendered, {
+            'price': 1.5,
+            'label': 'Price',
+            'symbols': ['AAPL'],
+            'score': 0.5,
+        })
+
+    def test_indent(self):
+        data = {'symbol': 'AAPL'}
+
+        self.assertEqual(self.renderer.render(data), b'{"symbol":"AAPL"}')
+        self.assertEqual(
+            self.renderer.render(data, 'application/json; indent=4'),
+            b'{\n  "symbol": "AAPL"\n}')
+        self.assertEqual(
+            self.renderer.render(data, renderer_context={'indent': 4}),
+            b'{\n  "symbol": "AAPL"\n}')
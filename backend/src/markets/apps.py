@@ -1,5 +1,6 @@
 from django.apps import AppConfig
 
+from complex_ai.settings import PRELOADED_STOCKS
 from markets import prediction
 
 
@@ -8,4 +9,4 @@ class MarketsConfig(AppConfig):
     name = 'markets'
 
     def ready(self):
-        prediction.load_all_models()
+        prediction.preload_models(PRELOADED_STOCKS)
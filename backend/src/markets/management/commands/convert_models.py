@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+import tensorflow as tf
+from tensorflow.keras import layers, models  # type: ignore
+
+from complex_ai.settings import SUPPORTED_STOCKS
+from markets.prediction import MODELS_DIR, SEQUENCE_LENGTH
+
+
+def _unrolled_model(model):
+    # The converter cannot legalize the TensorList ops of a dynamic LSTM loop.
+    # A copy with a static sequence length and the recurrent layers unrolled
+    # computes the same outputs with plain builtin ops.
+    def clone_layer(layer):
+        config = layer.get_config()
+        if isinstance(layer, layers.RNN):
+            config['unroll'] = True
+        return layer.__class__.from_config(config)
+
+    unrolled = models.clone_model(
+        model,
+        input_tensors=layers.Input(shape=(SEQUENCE_LENGTH, 1)),
+        clone_function=clone_layer)
+    unrolled.set_weights(model.get_weights())
+    return unrolled
+
+
+def _convert(model) -> bytes:
+    # Dynamic range quantization: weights are stored as int8 and activations
+    # stay float. The models take unscaled prices, which full int8
+    # quantization clamps badly, so activations are not quantized.
+    converter = tf.lite.TFLiteConverter.from_keras_model(_unrolled_model(model))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
+
+
+class Command(BaseCommand):
+    help = ('Convert the Keras stock models to TFLite models with int8 '
+            'weights, which StockPredictor prefers when present.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols',
+                            nargs='*',
+                            help='Symbols to convert (default: all supported).')
+
+    def handle(self, *args, **options):
+        symbols = [s.upper() for s in options['symbols']]
+        if not symbols:
+            symbols = SUPPORTED_STOCKS
+
+        for symbol in symbols:
+            model_path = MODELS_DIR / f'{symbol}.keras'
+            if not model_path.exists():
+                raise CommandError(f'Model file not found: {model_path}')
+
+            model = models.load_model(model_path)
+
+            tflite_path = MODELS_DIR / f'{symbol}.tflite'
+            tflite_path.write_bytes(_convert(model))
+            self.stdout.write(
+                self.style.SUCCESS(f'Wrote {tflite_path.name} for {symbol}.'))
@@ -1,33 +1,107 @@
+import functools
+import hashlib
 import logging
 import os
+import threading
 # import joblib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, List, Optional, Tuple
 
+from django.core.cache import cache
 import numpy as np
+import tensorflow as tf
 from tensorflow.keras import models  # type: ignore
 
 from complex_ai.settings import SUPPORTED_STOCKS
 
 logger = logging.getLogger(__name__)
 
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / 'models'
+SHARED_MODEL_PATH = MODELS_DIR / 'shared.keras'
+SEQUENCE_LENGTH = 60
+# The close sequence only changes once per trading day, so repeated requests
+# within this window reuse the previous output.
+PREDICTION_CACHE_TIMEOUT = 300
+
+_SEQUENCE_SPEC = tf.TensorSpec(shape=(None, SEQUENCE_LENGTH, 1),
+                               dtype=tf.float32)
+_SYMBOL_ID_SPEC = tf.TensorSpec(shape=(None,), dtype=tf.int32)
+
+
+def _trace_forward(model, input_signature: List[tf.TensorSpec]):
+    # A fixed signature with an unknown batch size gives a single concrete
+    # graph, so calls with a different batch size don't retrace. This also
+    # skips the per-call setup of model.predict.
+    if len(input_signature) == 1:
+        return tf.function(lambda x: model(x, training=False),
+                           input_signature=input_signature)
+
+    return tf.function(lambda *inputs: model(list(inputs), training=False),
+                       input_signature=input_signature)
+
+
+def _model_key(path: Path) -> str:
+    # Identifies the model file behind a prediction, so cached outputs are not
+    # served once a model is converted or retrained.
+    return f'{path.name}:{os.stat(path).st_mtime_ns}'
+
+
+def _cached_predictions(
+        key_prefix: str, symbols: List[str], data: np.ndarray,
+        infer: Callable[[List[int]], List[float]]) -> List[float]:
+    keys = []
+    for symbol, sequence in zip(symbols, data):
+        digest = hashlib.blake2b(np.ascontiguousarray(sequence).tobytes(),
+                                 digest_size=16).hexdigest()
+        keys.append(f'{key_prefix}:{symbol}:{digest}')
+
+    predictions = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in predictions]
+
+    if missing:
+        computed = dict(zip((keys[i] for i in missing), infer(missing)))
+        cache.set_many(computed, timeout=PREDICTION_CACHE_TIMEOUT)
+        predictions.update(computed)
+
+    return [predictions[key] for key in keys]
+
 
 class StockPredictor:
 
     def __init__(self, symbol: str):
         self.symbol = symbol.upper()
         self.model = None
+        self._forward = None
+        self.interpreter = None
         self.scaler = None
+        self._model_key = None
+        self._input_index = None
+        self._output_index = None
+        self._input_shape = None
+        self._interpreter_lock = threading.Lock()
         self._load_model()
 
     def _load_model(self):
-        base_path = Path(__file__).resolve().parent.parent.parent
-        model_dir = base_path / 'models'
-        model_path = model_dir / f'{self.symbol}.keras'
+        tflite_path = MODELS_DIR / f'{self.symbol}.tflite'
+        model_path = MODELS_DIR / f'{self.symbol}.keras'
+
+        if os.path.exists(tflite_path):
+            try:
+                self._load_interpreter(tflite_path)
+                self._model_key = _model_key(tflite_path)
+                logger.info('Quantized model loaded for %s.', self.symbol)
+                return
+            except (OSError, ValueError, RuntimeError) as e:
+                logger.error('Failed to load quantized model for %s: %s',
+                             self.symbol,
+                             e,
+                             exc_info=True)
 
         if os.path.exists(model_path):
             try:
                 self.model = models.load_model(model_path)
+                self._forward = _trace_forward(self.model, [_SEQUENCE_SPEC])
+                self._model_key = _model_key(model_path)
                 logger.info('Model loaded for %s.', self.symbol)
             except (OSError, ValueError) as e:
                 logger.error('Failed to load model for %s: %s',
@@ -42,29 +116,47 @@ class StockPredictor:
         #                            f'{self.symbol}_scaler.pkl')
         # self.scaler = joblib.load(scaler_path)
 
+    def _load_interpreter(self, tflite_path: Path):
+        interpreter = tf.lite.Interpreter(model_path=str(tflite_path))
+        interpreter.allocate_tensors()
+        input_details = interpreter.get_input_details()[0]
+        self._input_index = input_details['index']
+        self._input_shape = tuple(input_details['shape'])
+        self._output_index = interpreter.get_output_details()[0]['index']
+        self.interpreter = interpreter
+
+    def _invoke_interpreter(self, input_tensor: np.ndarray) -> np.ndarray:
+        # The interpreter owns a single set of tensor buffers, so concurrent
+        # requests have to take turns.
+        with self._interpreter_lock:
+            if input_tensor.shape != self._input_shape:
+                self.interpreter.resize_tensor_input(self._input_index,
+                                                     input_tensor.shape)
+                self.interpreter.allocate_tensors()
+                self._input_shape = input_tensor.shape
+
+            self.interpreter.set_tensor(self._input_index, input_tensor)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index).copy()
+
     def predict(self, recent_prices: List[float]) -> Optional[float]:
-        if not self.model:
+        predictions = self.predict_many([recent_prices])
+        return predictions[0] if predictions is not None else None
+
+    def predict_many(self,
+                     sequences: List[List[float]]) -> Optional[List[float]]:
+        if self.model is None and self.interpreter is None:
             logger.error('Cannot predict for %s: Model not initialized.',
                          self.symbol)
             return None
 
         try:
-            data = np.array(recent_prices)
-
-            # TODO: Apply Scaling (Critical!)
-            # The model expects values between 0 and 1.
-            # that expects 0.5. The result will likely be garbage until fixed.
-            # data = self.scaler.transform(data.reshape(-1, 1))
-
-            input_tensor = data.reshape((1, -1, 1))
-
-            prediction_scaled = self.model.predict(input_tensor, verbose=0)
+            data = np.stack(
+                [np.asarray(s, dtype=np.float32) for s in sequences])
 
-            # TODO: Inverse Scale
-            # result = self.scaler.inverse_transform(prediction_scaled)
-            # return float(result[0][0])
-
-            return float(prediction_scaled[0][0])
+            return _cached_predictions(f'pred:{self._model_key}',
+                                       [self.symbol] * len(data), data,
+                                       lambda i: self._infer(data[i]))
 
         except (ValueError, IndexError, TypeError) as e:
             logger.error('Prediction error for %s: %s',
@@ -73,11 +165,138 @@ class StockPredictor:
                          exc_info=True)
             return None
 
+    def _infer(self, data: np.ndarray) -> List[float]:
+        # TODO: Apply Scaling (Critical!)
+        # The model expects values between 0 and 1.
+        # that expects 0.5. The result will likely be garbage until fixed.
+        # data = self.scaler.transform(data.reshape(-1, 1))
+
+        input_tensor = data.reshape((len(data), -1, 1))
+
+        if self.interpreter is not None:
+            prediction_scaled = self._invoke_interpreter(input_tensor)
+        else:
+            prediction_scaled = self._forward(input_tensor).numpy()
+
+        # TODO: Inverse Scale
+        # result = self.scaler.inverse_transform(prediction_scaled)
+        # return result[:, 0].tolist()
+
+        return prediction_scaled[:, 0].tolist()
+
+
+class SharedStockPredictor:
+    # A single model for every supported stock, taking the close sequence
+    # and the symbol id as inputs. Symbol ids follow the order of
+    # SUPPORTED_STOCKS, which the model has to be trained with.
+
+    def __init__(self):
+        self.model = None
+        self._forward = None
+        self._model_key = None
+        self.symbol_ids = {
+            symbol: i for i, symbol in enumerate(SUPPORTED_STOCKS)
+        }
+        self._load_model()
+
+    def _load_model(self):
+        if not os.path.exists(SHARED_MODEL_PATH):
+            return
+
+        try:
+            self.model = models.load_model(SHARED_MODEL_PATH)
+            self._forward = _trace_forward(self.model,
+                                           [_SEQUENCE_SPEC, _SYMBOL_ID_SPEC])
+            self._model_key = _model_key(SHARED_MODEL_PATH)
+            logger.info('Shared model loaded.')
+        except (OSError, ValueError) as e:
+            logger.error('Failed to load shared model: %s', e, exc_info=True)
+
+    def predict_batch(self, symbols: List[str],
+                      sequences: List[List[float]]) -> Optional[List[float]]:
+        if self.model is None:
+            logger.error('Cannot predict: Shared model not initialized.')
+            return None
+
+        try:
+            data = np.stack(
+                [np.asarray(s, dtype=np.float32) for s in sequences])
+            symbol_ids = np.array([self.symbol_ids[s] for s in symbols],
+                                  dtype=np.int32)
+
+            return _cached_predictions(
+                f'pred:{self._model_key}', symbols, data,
+                lambda i: self._infer(data[i], symbol_ids[i]))
+
+        except (KeyError, ValueError, IndexError, TypeError) as e:
+            logger.error('Shared prediction error: %s', e, exc_info=True)
+            return None
+
+    def _infer(self, data: np.ndarray, symbol_ids: np.ndarray) -> List[float]:
+        # TODO: Apply Scaling, see StockPredictor._infer.
+        input_tensor = data.reshape((len(data), -1, 1))
+        prediction_scaled = self._forward(input_tensor, symbol_ids).numpy()
+        return prediction_scaled[:, 0].tolist()
+
+
+_shared_predictor_lock = threading.Lock()
+# The modification time of the shared model file and the predictor loaded
+# from it, or None if loading failed. A file added or replaced later is
+# picked up on the next request.
+_shared_predictor: Tuple[Optional[int],
+                         Optional[SharedStockPredictor]] = (None, None)
+
+
+def get_shared_predictor() -> Optional[SharedStockPredictor]:
+    global _shared_predictor
+
+    try:
+        mtime = os.stat(SHARED_MODEL_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+    # Held across the load, like _predictor_locks in get_predictor.
+    with _shared_predictor_lock:
+        loaded_mtime, predictor = _shared_predictor
+        if loaded_mtime != mtime:
+            predictor = SharedStockPredictor()
+            if predictor.model is None:
+                predictor = None
+            _shared_predictor = (mtime, predictor)
+
+    return predictor
+
+
+PREDICTOR_CACHE_SIZE = 32
+
+# One lock per symbol, so loading one model doesn't block requests for the
+# others.
+_predictor_locks = {symbol: threading.Lock() for symbol in SUPPORTED_STOCKS}
+
+
+@functools.lru_cache(maxsize=PREDICTOR_CACHE_SIZE)
+def _load_predictor(symbol: str) -> StockPredictor:
+    return StockPredictor(symbol)
+
+
+def get_predictor(symbol: str) -> Optional[StockPredictor]:
+    symbol = symbol.upper()
+    if symbol not in SUPPORTED_STOCKS:
+        return None
+
+    # Held across the load so concurrent first requests for a symbol don't
+    # each read the model from disk.
+    with _predictor_locks[symbol]:
+        return _load_predictor(symbol)
+
 
-PREDICTORS: Dict[str, StockPredictor] = {}
+def preload_models(symbols: List[str]):
+    if not symbols:
+        return
 
+    def load():
+        logger.info('Preloading Neural Network models...')
+        for symbol in symbols:
+            get_predictor(symbol)
 
-def load_all_models():
-    logger.info('Loading Neural Network models...')
-    for symbol in SUPPORTED_STOCKS:
-        PREDICTORS[symbol] = StockPredictor(symbol)
+    threading.Thread(target=load, name='model-preload', daemon=True).start()
@@ -0,0 +1,20 @@
+from typing import Optional, Union
+
+import msgspec
+
+
+class Quote(msgspec.Struct, rename='camel'):
+    symbol: str
+    name: str
+    price: Optional[float]
+    change_amount: Optional[float]
+    change_percent: Optional[float]
+    stale: bool = False
+
+
+class QuoteError(msgspec.Struct):
+    symbol: str
+    error: str
+
+
+LivePrice = Union[Quote, QuoteError]
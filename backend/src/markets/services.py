@@ -1,108 +1,521 @@
+import asyncio
+import functools
 import logging
-from typing import List, Dict, Any
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+import weakref
 
+from asgiref.sync import sync_to_async
+from curl_cffi import requests as curl_requests
+from django.core.cache import cache
+import httpx
+import msgspec
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util import Retry
 import yfinance as yf
+from yfinance.exceptions import YFException
 
-from markets.prediction import PREDICTORS
+from complex_ai.settings import SUPPORTED_STOCKS
+from markets.prediction import (SEQUENCE_LENGTH, StockPredictor, get_predictor,
+                                get_shared_predictor)
+from markets.schemas import LivePrice, Quote, QuoteError
 
 logger = logging.getLogger(__name__)
 
-SEQUENCE_LENGTH = 60
+QUOTE_BATCH_SIZE = 20
+REQUEST_TIMEOUT = 10
+MAX_WORKERS = 16
+HTTP_POOL_SIZE = 32
+LIVE_PRICES_CACHE_TIMEOUT = 10
+LIVE_PRICES_FALLBACK_TIMEOUT = 3600
+HISTORY_CACHE_TIMEOUT = 3600
+# A window ending in today's bar may be taken during the session, where the
+# last close is still moving, so it is only reused briefly.
+HISTORY_SESSION_CACHE_TIMEOUT = 60
+QUOTE_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_JITTER = 0.2
+# Upper bound on a server's Retry-After, so a rate limited request never
+# holds a worker for long past REQUEST_TIMEOUT.
+MAX_RETRY_AFTER = 2
 
+_COOKIE_URL = 'https://fc.yahoo.com'
+_CRUMB_URL = 'https://query1.finance.yahoo.com/v1/test/getcrumb'
+_QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+# Only the fields used by _build_price_entries, which keeps the response small.
+_QUOTE_FIELDS = 'regularMarketPrice,regularMarketPreviousClose,shortName'
 
-def get_live_prices(tickers: List[str]) -> List[Dict[str, Any]]:
+# Rate limited and server error responses are retried, waiting for the
+# Retry-After header on 429/503 and backing off otherwise. Other client
+# errors fail straight away since retrying them cannot help.
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class _QuoteRetry(Retry):
+
+    def parse_retry_after(self, retry_after: str) -> float:
+        # Jitter keeps the chunks of one batch from retrying in lockstep.
+        seconds = min(super().parse_retry_after(retry_after), MAX_RETRY_AFTER)
+        return seconds + random.uniform(0, RETRY_JITTER)
+
+
+_RETRY = _QuoteRetry(total=QUOTE_RETRIES,
+                     backoff_factor=RETRY_BACKOFF_FACTOR,
+                     backoff_jitter=RETRY_JITTER,
+                     status_forcelist=_RETRY_STATUSES)
+
+_QUOTE_ERRORS = (httpx.HTTPError, requests.exceptions.RequestException, OSError,
+                 KeyError, TypeError, ValueError)
+
+_SESSION = requests.Session()
+_SESSION.headers.update({'User-Agent': 'Mozilla/5.0'})
+_SESSION.mount(
+    'https://',
+    HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=_RETRY))
+
+# httpx clients are bound to the event loop they are used on, so the async
+# path keeps one long-lived client per loop. The HTTP/2 connection is then
+# reused across requests instead of being set up for every batch.
+_ASYNC_CLIENTS = weakref.WeakKeyDictionary()
+
+# yfinance rejects plain requests sessions, so its calls share a separate
+# curl_cffi session instead of opening new connections every time.
+_YF_SESSION = curl_requests.Session(impersonate='chrome')
+
+
+@functools.lru_cache(maxsize=1)
+def _get_crumb() -> str:
+    # Yahoo only answers quote requests that carry a crumb bound to the
+    # session cookie. The cookie endpoint itself responds with 404, so its
+    # status is not checked.
+    _SESSION.get(_COOKIE_URL, timeout=REQUEST_TIMEOUT)
+    response = _SESSION.get(_CRUMB_URL, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+
+def _quote_chunks(symbols: List[str]) -> List[List[str]]:
+    return [
+        symbols[i:i + QUOTE_BATCH_SIZE]
+        for i in range(0, len(symbols), QUOTE_BATCH_SIZE)
+    ]
+
+
+def _quote_params(chunk: List[str], crumb: str) -> Dict[str, str]:
+    return {'symbols': ','.join(chunk), 'fields': _QUOTE_FIELDS, 'crumb': crumb}
+
+
+def _fetch_quote_chunk(chunk: List[str], crumb: str) -> List[Dict[str, Any]]:
+    response = _SESSION.get(_QUOTE_URL,
+                            params=_quote_params(chunk, crumb),
+                            timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 401:
+        # The crumb expired together with its cookie, fetch a new pair on the
+        # next call.
+        _get_crumb.cache_clear()
+    response.raise_for_status()
+
+    return response.json()['quoteResponse']['result']
+
+
+def _batch_quote(
+        symbols: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+    chunks = _quote_chunks(symbols)
+    if not chunks:
+        return {}, set()
+
+    crumb = _get_crumb()
+    quotes: Dict[str, Dict[str, Any]] = {}
+    failed: Set[str] = set()
+
+    with ThreadPoolExecutor(
+            max_workers=min(MAX_WORKERS, len(chunks))) as executor:
+        futures = {
+            executor.submit(_fetch_quote_chunk, chunk, crumb): chunk
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            # A failed chunk only affects its own symbols, which fall back in
+            # _merge_quotes.
+            try:
+                results = future.result()
+            except _QUOTE_ERRORS as e:
+                logger.error('Yahoo Finance quote request failed for %s: %s',
+                             ','.join(futures[future]), e)
+                failed.update(futures[future])
+                continue
+
+            for result in results:
+                quotes[result['symbol']] = result
+
+    return quotes, failed
+
+
+def _build_price_entries(quotes: Dict[str, Dict[str, Any]]) -> Dict[str, Quote]:
+    symbols = list(quotes)
+    if not symbols:
+        return {}
+
+    # Missing prices become NaN, so the change columns are computed in one
+    # pass and the None checks reduce to a single mask.
+    current = np.array([quotes[s].get('regularMarketPrice') for s in symbols],
+                       dtype=np.float64)
+    previous = np.array(
+        [quotes[s].get('regularMarketPreviousClose') for s in symbols],
+        dtype=np.float64)
+
+    valid = ~np.isnan(current) & ~np.isnan(previous) & (previous != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_amounts = current - previous
+        change_percents = change_amounts / previous * 100
+
+    entries = {}
+
+    for symbol, is_valid, change_amount, change_percent in zip(
+            symbols, valid.tolist(), change_amounts.tolist(),
+            change_percents.tolist()):
+        quote = quotes[symbol]
+        entries[symbol] = Quote(
+            symbol=symbol,
+            name=quote.get('shortName', symbol),
+            price=quote.get('regularMarketPrice'),
+            change_amount=change_amount if is_valid else None,
+            change_percent=change_percent if is_valid else None,
+            # Entries are only reused for LIVE_PRICES_CACHE_TIMEOUT seconds,
+            # so anything built from a live quote counts as fresh.
+            stale=False)
+
+    return entries
+
+
+def _normalize_tickers(tickers: List[str]) -> List[str]:
+    return [t.strip().upper() for t in tickers if t.strip()]
+
+
+def _response_cache_key(tickers: List[str]) -> str:
+    return 'lpq:' + ','.join(sorted(set(tickers)))
+
+
+def _lookup_cached_prices(
+        tickers: List[str]) -> Tuple[Dict[str, LivePrice], List[str]]:
+    response_key = _response_cache_key(tickers)
+    entries = cache.get(response_key)
+    if entries is not None:
+        logger.debug('Live prices cache_hit for %s.', response_key)
+        return entries, []
+    logger.debug('Live prices cache_miss for %s.', response_key)
+
+    unique_tickers = sorted(set(tickers))
+    cached_entries = cache.get_many(['lpq1:' + s for s in unique_tickers])
+    entries = {
+        key[len('lpq1:'):]: entry for key, entry in cached_entries.items()
+    }
+    missing = [s for s in unique_tickers if s not in entries]
+    logger.debug('Live prices per-symbol cache_hit=%d cache_miss=%d.',
+                 len(entries), len(missing))
+
+    return entries, missing
+
+
+def _merge_quotes(tickers: List[str], entries: Dict[str, LivePrice],
+                  missing: List[str], quotes: Dict[str, Dict[str, Any]],
+                  failed: Set[str]) -> Optional[List[LivePrice]]:
+    fallback_keys = ['lpq_last:' + s for s in missing if s not in quotes]
+    fallbacks = cache.get_many(fallback_keys) if fallback_keys else {}
+    fetched = _build_price_entries(
+        {s: quotes[s] for s in missing if s in quotes})
+
+    for symbol in missing:
+        if symbol in fetched:
+            continue
+
+        fallback = fallbacks.get('lpq_last:' + symbol)
+        if fallback is not None:
+            logger.warning('Serving last known quote for %s.', symbol)
+            entries[symbol] = msgspec.structs.replace(fallback, stale=True)
+        else:
+            logger.warning('No quote returned for %s.', symbol)
+            entries[symbol] = QuoteError(symbol=symbol,
+                                         error='Data unavailable')
+
+    entries.update(fetched)
+    if failed and all(
+            isinstance(entry, QuoteError) for entry in entries.values()):
+        return None
+
+    # A symbol left out of a successful response is a ticker Yahoo does not
+    # know, so its error is cached like a fresh quote and not sent upstream
+    # again on every poll. Symbols whose request failed are left uncached, so
+    # the next request asks Yahoo again instead of serving the fallback.
+    resolved_entries = {
+        'lpq1:' + s: entries[s] for s in missing if s not in failed
+    }
+    last_entries = {'lpq_last:' + s: e for s, e in fetched.items()}
+    cache.set_many(resolved_entries, timeout=LIVE_PRICES_CACHE_TIMEOUT)
+    cache.set_many(last_entries, timeout=LIVE_PRICES_FALLBACK_TIMEOUT)
+    if not failed:
+        cache.set(_response_cache_key(tickers),
+                  entries,
+                  timeout=LIVE_PRICES_CACHE_TIMEOUT)
+
+    return [entries[symbol] for symbol in tickers]
+
+
+def get_live_prices(tickers: List[str]) -> Optional[List[LivePrice]]:
     if not tickers:
         return []
 
-    tickers = [t.strip().upper() for t in tickers if t.strip()]
+    tickers = _normalize_tickers(tickers)
+    entries, missing = _lookup_cached_prices(tickers)
+    if not missing:
+        return [entries[symbol] for symbol in tickers]
 
     try:
-        data = yf.Tickers(' '.join(tickers))
-        results = []
+        quotes, failed = _batch_quote(missing)
+    except _QUOTE_ERRORS as e:
+        logger.error('Yahoo Finance connection error: %s', e, exc_info=True)
+        quotes, failed = {}, set(missing)
 
-        for symbol in tickers:
-            try:
-                ticker_obj = data.tickers[symbol]
-                info = ticker_obj.info
-
-                current_price = info.get('currentPrice')
-                previous_close = info.get('previousClose')
-
-                change_amount = None
-                change_percent = None
-
-                if current_price is not None and previous_close:
-                    change_amount = current_price - previous_close
-                    if previous_close != 0:
-                        change_percent = (change_amount / previous_close) * 100
-                    else:
-                        change_percent = 0
-
-                results.append({
-                    'symbol': symbol,
-                    'name': info.get('shortName', symbol),
-                    'price': current_price,
-                    'changeAmount': change_amount,
-                    'changePercent': change_percent,
-                })
-            except (KeyError, AttributeError, IndexError, TypeError,
-                    ValueError) as e:
-                logger.warning('Error fetching data for %s: %s',
-                               symbol,
-                               e,
-                               exc_info=True)
-                results.append({'symbol': symbol, 'error': 'Data unavailable'})
-
-        return results
-
-    except (requests.exceptions.RequestException, OSError) as e:
-        logger.error('yfinance connection error: %s', e, exc_info=True)
-        return [{'error': 'External API Unavailable'}]
+    return _merge_quotes(tickers, entries, missing, quotes, failed)
 
 
-def get_stock_prediction(symbol: str) -> Dict[str, Any]:
-    symbol = symbol.upper()
-    predictor = PREDICTORS.get(symbol)
+def _get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        # The transport only retries failed connection attempts, statuses
+        # are retried in _afetch_quote_chunk.
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=QUOTE_RETRIES,
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE))
+        client = httpx.AsyncClient(transport=transport,
+                                   headers=dict(_SESSION.headers),
+                                   timeout=REQUEST_TIMEOUT)
+        _ASYNC_CLIENTS[loop] = client
+    return client
 
-    if not predictor:
-        return {
-            'symbol': symbol,
-            'error': 'Model not available for this stock (Check models/)'
-        }
 
-    try:
-        ticker = yf.Ticker(symbol)
-        history = ticker.history(period='3mo')
+async def aclose_http_client():
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
 
-        if len(history) < SEQUENCE_LENGTH:
-            return {
-                'symbol':
-                    symbol,
-                'error': (f'Insufficient data: {len(history)}/{SEQUENCE_LENGTH}'
-                          ' days fetched')
-            }
 
-        recent_closes = history['Close'].values[-SEQUENCE_LENGTH:].tolist()
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    # Same policy as _RETRY on the synchronous session.
+    retry_after = response.headers.get('Retry-After')
+    if (retry_after is not None and
+            response.status_code in Retry.RETRY_AFTER_STATUS_CODES):
+        try:
+            return _RETRY.parse_retry_after(retry_after)
+        except InvalidHeader:
+            pass
 
-        predicted_scaled = predictor.predict(recent_closes)
+    return RETRY_BACKOFF_FACTOR * 2**attempt + random.uniform(0, RETRY_JITTER)
 
-        if predicted_scaled is None:
-            return {'symbol': symbol, 'error': 'Prediction calculation failed'}
 
-        trend = 'BULLISH' if predicted_scaled > 0.5 else 'BEARISH'
+async def _afetch_quote_chunk(client: httpx.AsyncClient, chunk: List[str],
+                              crumb: str) -> List[Dict[str, Any]]:
+    params = _quote_params(chunk, crumb)
 
-        return {
-            'symbol': symbol,
-            'prediction': trend,
-            'raw_score': predicted_scaled,
-            'confidence': abs(predicted_scaled - 0.5) * 2,
-            'ai_analysis': f'Neural Network Raw Output: {predicted_scaled:.4f}'
-        }
+    for attempt in range(QUOTE_RETRIES + 1):
+        response = await client.get(_QUOTE_URL, params=params)
+        if (response.status_code not in _RETRY_STATUSES or
+                attempt == QUOTE_RETRIES):
+            break
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+    if response.status_code == 401:
+        _get_crumb.cache_clear()
+    response.raise_for_status()
+
+    return response.json()['quoteResponse']['result']
+
+
+async def _abatch_quote(
+        symbols: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+    chunks = _quote_chunks(symbols)
+    if not chunks:
+        return {}, set()
+
+    # The crumb is bound to the cookie held by the shared requests session.
+    # Both are renewed when the crumb expires, so the cookie is copied into
+    # the async client on every batch.
+    crumb = await sync_to_async(_get_crumb)()
+    client = _get_async_client()
+    client.cookies.update(_SESSION.cookies)
+
+    results = await asyncio.gather(
+        *(_afetch_quote_chunk(client, chunk, crumb) for chunk in chunks),
+        return_exceptions=True)
+
+    quotes: Dict[str, Dict[str, Any]] = {}
+    failed: Set[str] = set()
+
+    for chunk, chunk_results in zip(chunks, results):
+        if isinstance(chunk_results, _QUOTE_ERRORS):
+            logger.error('Yahoo Finance quote request failed for %s: %s',
+                         ','.join(chunk), chunk_results)
+            failed.update(chunk)
+            continue
+        if isinstance(chunk_results, BaseException):
+            raise chunk_results
+
+        for result in chunk_results:
+            quotes[result['symbol']] = result
 
-    except (requests.exceptions.RequestException, OSError, ValueError) as e:
+    return quotes, failed
+
+
+async def aget_live_prices(tickers: List[str]) -> Optional[List[LivePrice]]:
+    if not tickers:
+        return []
+
+    tickers = _normalize_tickers(tickers)
+    entries, missing = await sync_to_async(_lookup_cached_prices)(tickers)
+    if not missing:
+        return [entries[symbol] for symbol in tickers]
+
+    try:
+        quotes, failed = await _abatch_quote(missing)
+    except _QUOTE_ERRORS as e:
+        logger.error('Yahoo Finance connection error: %s', e, exc_info=True)
+        quotes, failed = {}, set(missing)
+
+    return await sync_to_async(_merge_quotes)(tickers, entries, missing, quotes,
+                                              failed)
+
+
+def _fetch_recent_closes(
+        symbol: str) -> Tuple[Optional[List[float]], Optional[Dict[str, Any]]]:
+    # Completed daily closes do not change, so a fetched window is reused for
+    # HISTORY_CACHE_TIMEOUT, but never across days. A window that ends in
+    # today's bar is kept for HISTORY_SESSION_CACHE_TIMEOUT instead.
+    key = f'hist:{symbol}:{date.today().isoformat()}'
+    cached = cache.get(key)
+    if cached is not None:
+        return np.frombuffer(cached, dtype=np.float32).tolist(), None
+
+    try:
+        ticker = yf.Ticker(symbol, session=_YF_SESSION)
+        history = ticker.history(period='3mo')
+    except (YFException, requests.exceptions.RequestException, OSError,
+            ValueError) as e:
+        # Includes YFRateLimitError. Caught here so one rate limited symbol
+        # does not fail the whole get_stock_predictions batch.
         logger.error('Prediction service error for %s: %s',
                      symbol,
                      e,
                      exc_info=True)
-        return {'symbol': symbol, 'error': 'Analysis failed due to data error'}
+        return None, {
+            'symbol': symbol,
+            'error': 'Analysis failed due to data error'
+        }
+
+    if len(history) < SEQUENCE_LENGTH:
+        return None, {
+            'symbol':
+                symbol,
+            'error': (f'Insufficient data: {len(history)}/{SEQUENCE_LENGTH}'
+                      ' days fetched')
+        }
+
+    recent_closes = history['Close'].values[-SEQUENCE_LENGTH:].astype(
+        np.float32)
+    last_bar = history.index[-1]
+    in_session = last_bar.date() == datetime.now(last_bar.tz).date()
+    cache.set(key,
+              recent_closes.tobytes(),
+              timeout=(HISTORY_SESSION_CACHE_TIMEOUT
+                       if in_session else HISTORY_CACHE_TIMEOUT))
+
+    return recent_closes.tolist(), None
+
+
+def _build_prediction(symbol: str,
+                      predicted_scaled: Optional[float]) -> Dict[str, Any]:
+    if predicted_scaled is None:
+        return {'symbol': symbol, 'error': 'Prediction calculation failed'}
+
+    trend = 'BULLISH' if predicted_scaled > 0.5 else 'BEARISH'
+
+    return {
+        'symbol': symbol,
+        'prediction': trend,
+        'raw_score': predicted_scaled,
+        'confidence': abs(predicted_scaled - 0.5) * 2,
+        'ai_analysis': f'Neural Network Raw Output: {predicted_scaled:.4f}'
+    }
+
+
+def get_stock_prediction(symbol: str) -> Dict[str, Any]:
+    return get_stock_predictions([symbol])[0]
+
+
+def get_stock_predictions(symbols: List[str]) -> List[Dict[str, Any]]:
+    symbols = [s.strip().upper() for s in symbols]
+    if not symbols:
+        return []
+
+    results: Dict[str, Dict[str, Any]] = {}
+    supported = []
+
+    for symbol in dict.fromkeys(symbols):
+        if symbol in SUPPORTED_STOCKS:
+            supported.append(symbol)
+        else:
+            results[symbol] = {
+                'symbol': symbol,
+                'error': 'Model not available for this stock (Check models/)'
+            }
+
+    sequences: Dict[str, List[float]] = {}
+
+    if supported:
+        with ThreadPoolExecutor(
+                max_workers=min(MAX_WORKERS, len(supported))) as executor:
+            fetched = executor.map(_fetch_recent_closes, supported)
+            for symbol, (recent_closes, error) in zip(supported, fetched):
+                if error is not None:
+                    results[symbol] = error
+                else:
+                    sequences[symbol] = recent_closes
+
+    shared_predictor = get_shared_predictor()
+    batches: List[Tuple[List[str], Optional[List[float]]]] = []
+
+    if shared_predictor is not None and sequences:
+        # Every symbol goes through the shared model in one forward pass.
+        batches.append(
+            (list(sequences),
+             shared_predictor.predict_batch(list(sequences),
+                                            list(sequences.values()))))
+    else:
+        # Sequences are grouped per model so each one runs a single batched
+        # forward pass, however many of its symbols were requested.
+        grouped: Dict[StockPredictor, List[str]] = {}
+        for symbol in sequences:
+            grouped.setdefault(get_predictor(symbol), []).append(symbol)
+
+        for predictor, batch_symbols in grouped.items():
+            batches.append(
+                (batch_symbols,
+                 predictor.predict_many([sequences[s] for s in batch_symbols])))
+
+    for batch_symbols, predictions in batches:
+        if predictions is None:
+            predictions = [None] * len(batch_symbols)
+
+        for symbol, predicted_scaled in zip(batch_symbols, predictions):
+            results[symbol] = _build_prediction(symbol, predicted_scaled)
+
+    return [results[symbol] for symbol in symbols]
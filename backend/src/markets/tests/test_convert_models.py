@@ -0,0 +1,43 @@
+from pathlib import Path
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+import numpy as np
+from tensorflow.keras import models  # type: ignore
+
+from markets import prediction
+from markets.management.commands.convert_models import _convert
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConvertModelsTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tflite_predictor_matches_keras_model(self):
+        model = models.load_model(prediction.MODELS_DIR / 'AAPL.keras')
+        rng = np.random.default_rng(0)
+        closes = 150 * np.exp(np.cumsum(rng.normal(0, 0.015, 200)))
+        sequences = np.lib.stride_tricks.sliding_window_view(
+            closes.astype(np.float32), prediction.SEQUENCE_LENGTH)[::40]
+        expected = model(sequences[..., np.newaxis]).numpy()[:, 0]
+
+        with tempfile.TemporaryDirectory() as models_dir:
+            (Path(models_dir) / 'AAPL.tflite').write_bytes(_convert(model))
+            with mock.patch.object(prediction, 'MODELS_DIR', Path(models_dir)):
+                predictor = prediction.StockPredictor('AAPL')
+
+        self.assertIsNotNone(predictor.interpreter)
+        self.assertIsNone(predictor.model)
+        np.testing.assert_allclose(predictor.predict_many(sequences.tolist()),
+                                   expected,
+                                   rtol=0.01)
@@ -0,0 +1,171 @@
+# pylint: disable=protected-access
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+import numpy as np
+from tensorflow.keras import layers, models  # type: ignore
+
+from complex_ai.settings import SUPPORTED_STOCKS
+from markets import prediction, services
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def _closes(seed, count=1):
+    rng = np.random.default_rng(seed)
+    return (100 + rng.normal(0, 1, (count, prediction.SEQUENCE_LENGTH))).astype(
+        np.float32)
+
+
+def _sequence_model():
+    sequence = layers.Input(shape=(prediction.SEQUENCE_LENGTH, 1))
+    return models.Model(sequence, layers.Dense(1)(layers.Flatten()(sequence)))
+
+
+def _shared_model():
+    sequence = layers.Input(shape=(prediction.SEQUENCE_LENGTH, 1))
+    symbol_id = layers.Input(shape=(), dtype='int32')
+    embedded = layers.Embedding(len(SUPPORTED_STOCKS), 1)(symbol_id)
+    features = layers.Concatenate()([layers.Flatten()(sequence), embedded])
+    return models.Model([sequence, symbol_id], layers.Dense(1)(features))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SharedPredictorTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        models_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(models_dir.cleanup)
+        self.model_path = Path(models_dir.name) / 'shared.keras'
+
+        for patcher in (
+                mock.patch.object(prediction, 'SHARED_MODEL_PATH',
+                                  self.model_path),
+                mock.patch.object(prediction, '_shared_predictor',
+                                  (None, None)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_predictions_use_shared_model(self):
+        model = _shared_model()
+        model.save(self.model_path)
+        closes = _closes(0, 2)
+        sequences = {'MSFT': closes[0].tolist(), 'AAPL': closes[1].tolist()}
+
+        def fetch(symbol):
+            return sequences[symbol], None
+
+        with mock.patch.object(services, '_fetch_recent_closes', fetch):
+            results = services.get_stock_predictions(['MSFT', 'AAPL'])
+
+        expected = model.predict(
+            [closes[..., np.newaxis],
+             np.array([1, 0], dtype=np.int32)],
+            verbose=0)[:, 0]
+        self.assertEqual([r['symbol'] for r in results], ['MSFT', 'AAPL'])
+        for result, score in zip(results, expected.tolist()):
+            self.assertAlmostEqual(result['raw_score'], score, places=4)
+
+    def test_model_added_later_is_loaded(self):
+        self.assertIsNone(prediction.get_shared_predictor())
+
+        _shared_model().save(self.model_path)
+        predictor = prediction.get_shared_predictor()
+
+        self.assertIsNotNone(predictor)
+        self.assertIs(prediction.get_shared_predictor(), predictor)
+
+    def test_concurrent_first_requests_load_once(self):
+        _shared_model().save(self.model_path)
+
+        with mock.patch.object(prediction,
+                               'SharedStockPredictor',
+                               wraps=prediction.SharedStockPredictor) as cls:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                predictors = list(
+                    executor.map(lambda _: prediction.get_shared_predictor(),
+                                 range(4)))
+
+        self.assertEqual(cls.call_count, 1)
+        self.assertTrue(all(p is predictors[0] for p in predictors))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StockPredictorTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        models_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(models_dir.cleanup)
+        self.model_path = Path(models_dir.name) / 'AAPL.keras'
+
+        patcher = mock.patch.object(prediction, 'MODELS_DIR',
+                                    Path(models_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _predictor(self, model):
+        model.save(self.model_path)
+        return prediction.StockPredictor('AAPL')
+
+    def test_cache_hit_skips_inference(self):
+        predictor = self._predictor(_sequence_model())
+        closes = _closes(1, 3)
+        first = predictor.predict_many(closes[:2].tolist())
+
+        with mock.patch.object(predictor, '_infer',
+                               wraps=predictor._infer) as infer:
+            second = predictor.predict_many(closes.tolist())
+
+        # Only the sequence that was not cached yet reaches the model.
+        infer.assert_called_once()
+        np.testing.assert_array_equal(infer.call_args.args[0], closes[2:])
+        self.assertEqual(second[:2], first)
+
+    def test_replaced_model_is_not_served_from_cache(self):
+        closes = _closes(2, 2)
+        self._predictor(_sequence_model()).predict_many(closes.tolist())
+
+        model = _sequence_model()
+        model.save(self.model_path)
+        # Make sure the new file gets a different mtime on coarse clocks.
+        mtime = os.stat(self.model_path).st_mtime_ns + 1_000_000_000
+        os.utime(self.model_path, ns=(mtime, mtime))
+        predictor = prediction.StockPredictor('AAPL')
+
+        with mock.patch.object(predictor, '_infer',
+                               wraps=predictor._infer) as infer:
+            predictions = predictor.predict_many(closes.tolist())
+
+        infer.assert_called_once()
+        np.testing.assert_allclose(predictions,
+                                   model.predict(closes[..., np.newaxis],
+                                                 verbose=0)[:, 0],
+                                   rtol=1e-5)
+
+    def test_traced_forward_matches_model_predict(self):
+        model = _sequence_model()
+        predictor = self._predictor(model)
+        self.assertIsNone(predictor.interpreter)
+
+        for seed, batch_size in ((3, 2), (4, 5)):
+            closes = _closes(seed, batch_size)
+            np.testing.assert_allclose(predictor.predict_many(closes.tolist()),
+                                       model.predict(closes[..., np.newaxis],
+                                                     verbose=0)[:, 0],
+                                       rtol=1e-5)
+
+        # The fixed input signature leaves the batch size unknown, so the
+        # second batch size reuses the first graph.
+        self.assertEqual(predictor._forward.experimental_get_tracing_count(), 1)
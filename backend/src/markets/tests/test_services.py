@@ -0,0 +1,368 @@
+# pylint: disable=protected-access
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+import httpx
+import numpy as np
+import pandas as pd
+import requests
+from yfinance.exceptions import YFRateLimitError
+
+from markets import services
+from markets.schemas import Quote, QuoteError
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def _yahoo_quote(symbol, price=110.0, previous_close=100.0):
+    return {
+        'symbol': symbol,
+        'shortName': f'{symbol} Inc.',
+        'regularMarketPrice': price,
+        'regularMarketPreviousClose': previous_close,
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GetLivePricesTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.failing = set()
+        self.requested = []
+
+        patcher = mock.patch.object(services, '_get_crumb', return_value='c')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(services, '_fetch_quote_chunk',
+                                    self._fetch_quote_chunk)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fetch_quote_chunk(self, chunk, crumb):
+        self.assertEqual(crumb, 'c')
+        self.requested.append(list(chunk))
+        if self.failing.intersection(chunk):
+            raise requests.exceptions.HTTPError('429 Too Many Requests')
+        # Yahoo silently leaves unknown tickers out of the result.
+        return [_yahoo_quote(s) for s in chunk if s != 'UNKNOWN']
+
+    def test_fresh_quotes(self):
+        prices = services.get_live_prices([' aapl', 'MSFT '])
+
+        self.assertEqual(prices, [
+            Quote(symbol='AAPL',
+                  name='AAPL Inc.',
+                  price=110.0,
+                  change_amount=10.0,
+                  change_percent=10.0),
+            Quote(symbol='MSFT',
+                  name='MSFT Inc.',
+                  price=110.0,
+                  change_amount=10.0,
+                  change_percent=10.0),
+        ])
+        self.assertEqual(self.requested, [['AAPL', 'MSFT']])
+
+    def test_missing_previous_close_has_no_change(self):
+        with mock.patch.object(
+                services,
+                '_fetch_quote_chunk',
+                return_value=[_yahoo_quote('AAPL', previous_close=None)]):
+            [price] = services.get_live_prices(['AAPL'])
+
+        self.assertEqual(price.price, 110.0)
+        self.assertIsNone(price.change_amount)
+        self.assertIsNone(price.change_percent)
+
+    def test_cached_quotes_skip_upstream(self):
+        first = services.get_live_prices(['AAPL', 'MSFT'])
+        second = services.get_live_prices(['MSFT', 'AAPL'])
+
+        self.assertEqual(second, first[::-1])
+        self.assertEqual(self.requested, [['AAPL', 'MSFT']])
+
+    def test_only_uncached_symbols_are_fetched(self):
+        services.get_live_prices(['AAPL'])
+        services.get_live_prices(['AAPL', 'MSFT'])
+
+        self.assertEqual(self.requested, [['AAPL'], ['MSFT']])
+
+    def test_unknown_ticker_is_cached(self):
+        first = services.get_live_prices(['AAPL', 'UNKNOWN'])
+        second = services.get_live_prices(['AAPL', 'UNKNOWN'])
+
+        self.assertEqual(first[1],
+                         QuoteError(symbol='UNKNOWN', error='Data unavailable'))
+        self.assertEqual(second, first)
+        self.assertEqual(self.requested, [['AAPL', 'UNKNOWN']])
+
+    def test_failed_symbol_falls_back_to_last_quote(self):
+        services.get_live_prices(['AAPL'])
+        cache.delete_many(['lpq:AAPL', 'lpq1:AAPL'])
+        self.failing.add('AAPL')
+
+        [price] = services.get_live_prices(['AAPL'])
+
+        self.assertTrue(price.stale)
+        self.assertEqual(price.price, 110.0)
+
+        # The fallback is not cached, so the next request asks Yahoo again.
+        self.failing.clear()
+        [price] = services.get_live_prices(['AAPL'])
+
+        self.assertFalse(price.stale)
+        self.assertEqual(self.requested, [['AAPL'], ['AAPL'], ['AAPL']])
+
+    def test_failed_chunk_only_affects_its_symbols(self):
+        self.failing.add('MSFT')
+
+        with mock.patch.object(services, 'QUOTE_BATCH_SIZE', 1):
+            prices = services.get_live_prices(['AAPL', 'MSFT'])
+
+        self.assertIsInstance(prices[0], Quote)
+        self.assertFalse(prices[0].stale)
+        self.assertEqual(prices[1],
+                         QuoteError(symbol='MSFT', error='Data unavailable'))
+
+    def test_failed_chunk_is_retried_on_next_request(self):
+        self.failing.add('MSFT')
+
+        with mock.patch.object(services, 'QUOTE_BATCH_SIZE', 1):
+            services.get_live_prices(['AAPL', 'MSFT'])
+            self.failing.clear()
+            prices = services.get_live_prices(['AAPL', 'MSFT'])
+
+        self.assertEqual(self.requested, [['AAPL'], ['MSFT'], ['MSFT']])
+        self.assertIsInstance(prices[1], Quote)
+
+    def test_all_failed_without_fallback(self):
+        self.failing.update(['AAPL', 'MSFT'])
+
+        self.assertIsNone(services.get_live_prices(['AAPL', 'MSFT']))
+        # Nothing is cached, so the next poll tries Yahoo again.
+        self.assertIsNone(services.get_live_prices(['AAPL', 'MSFT']))
+        self.assertEqual(len(self.requested), 2)
+
+    def test_crumb_failure_is_upstream_failure(self):
+        with mock.patch.object(services,
+                               '_get_crumb',
+                               side_effect=requests.exceptions.ConnectionError):
+            self.assertIsNone(services.get_live_prices(['AAPL']))
+
+
+def _history(end):
+    # Daily bars as yfinance returns them, indexed in the exchange timezone.
+    return pd.DataFrame({'Close': np.linspace(100.1, 130.3, 70)},
+                        index=pd.date_range(end=end,
+                                            periods=70,
+                                            freq='D',
+                                            tz='America/New_York'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FetchRecentClosesTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_closes_are_cached(self):
+        history = _history('2024-01-31')
+
+        with mock.patch.object(services.yf, 'Ticker') as ticker, \
+                mock.patch.object(services, 'cache', wraps=cache) as cache_mock:
+            ticker.return_value.history.return_value = history
+            first, _ = services._fetch_recent_closes('AAPL')
+            second, _ = services._fetch_recent_closes('AAPL')
+
+        self.assertEqual(ticker.call_count, 1)
+        self.assertEqual(
+            first, history['Close'].values[-services.SEQUENCE_LENGTH:].astype(
+                np.float32).tolist())
+        self.assertEqual(second, first)
+        self.assertEqual(cache_mock.set.call_args.kwargs['timeout'],
+                         services.HISTORY_CACHE_TIMEOUT)
+
+    def test_window_ending_today_is_cached_briefly(self):
+        today = pd.Timestamp.now(tz='America/New_York').normalize()
+
+        with mock.patch.object(services.yf, 'Ticker') as ticker, \
+                mock.patch.object(services, 'cache', wraps=cache) as cache_mock:
+            ticker.return_value.history.return_value = _history(today)
+            services._fetch_recent_closes('AAPL')
+
+        self.assertEqual(cache_mock.set.call_args.kwargs['timeout'],
+                         services.HISTORY_SESSION_CACHE_TIMEOUT)
+
+    def test_rate_limit_is_a_symbol_error(self):
+        with mock.patch.object(services.yf, 'Ticker') as ticker:
+            ticker.return_value.history.side_effect = YFRateLimitError()
+            closes, error = services._fetch_recent_closes('AAPL')
+
+        self.assertIsNone(closes)
+        self.assertEqual(error, {
+            'symbol': 'AAPL',
+            'error': 'Analysis failed due to data error'
+        })
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncGetLivePricesTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.requested = []
+        # Statuses returned for a symbol's chunk, one per request. The last
+        # one repeats.
+        self.statuses = {}
+
+        patcher = mock.patch.object(services, '_get_crumb', return_value='c')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _handler(self, request):
+        symbols = request.url.params['symbols'].split(',')
+        self.requested.append(symbols)
+
+        for symbol in symbols:
+            statuses = self.statuses.get(symbol, [200])
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            if status != 200:
+                return httpx.Response(status, headers={'Retry-After': '0'})
+
+        return httpx.Response(
+            200,
+            json={
+                'quoteResponse': {
+                    'result': [_yahoo_quote(s) for s in symbols]
+                }
+            })
+
+    async def _get_live_prices(self, tickers):
+        loop = asyncio.get_running_loop()
+        services._ASYNC_CLIENTS[loop] = httpx.AsyncClient(
+            transport=httpx.MockTransport(self._handler))
+        try:
+            with mock.patch.object(services, 'QUOTE_BATCH_SIZE', 1):
+                return await services.aget_live_prices(tickers)
+        finally:
+            await services.aclose_http_client()
+
+    async def test_client_is_reused_until_closed(self):
+        client = services._get_async_client()
+
+        self.assertIs(services._get_async_client(), client)
+        await services.aclose_http_client()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(services._get_async_client(), client)
+        await services.aclose_http_client()
+
+    async def test_failed_chunk_only_affects_its_symbols(self):
+        self.statuses['MSFT'] = [404]
+
+        prices = await self._get_live_prices(['AAPL', 'MSFT'])
+
+        self.assertEqual(self.requested, [['AAPL'], ['MSFT']])
+        self.assertIsInstance(prices[0], Quote)
+        self.assertEqual(prices[1],
+                         QuoteError(symbol='MSFT', error='Data unavailable'))
+
+    async def test_rate_limited_chunk_is_retried(self):
+        self.statuses['MSFT'] = [429, 200]
+
+        prices = await self._get_live_prices(['AAPL', 'MSFT'])
+
+        self.assertEqual(self.requested, [['AAPL'], ['MSFT'], ['MSFT']])
+        self.assertIsInstance(prices[1], Quote)
+
+    async def test_retries_are_bounded(self):
+        self.statuses['MSFT'] = [503]
+
+        prices = await self._get_live_prices(['AAPL', 'MSFT'])
+
+        self.assertEqual(self.requested.count(['MSFT']),
+                         services.QUOTE_RETRIES + 1)
+        self.assertEqual(prices[1],
+                         QuoteError(symbol='MSFT', error='Data unavailable'))
+
+
+class RetryDelayTests(SimpleTestCase):
+
+    def test_retry_after_is_capped(self):
+        response = httpx.Response(429, headers={'Retry-After': '120'})
+
+        delay = services._retry_delay(response, 0)
+
+        self.assertGreaterEqual(delay, services.MAX_RETRY_AFTER)
+        self.assertLessEqual(delay,
+                             services.MAX_RETRY_AFTER + services.RETRY_JITTER)
+
+    def test_sync_retry_after_is_capped(self):
+        delay = services._RETRY.parse_retry_after('120')
+
+        self.assertLessEqual(delay,
+                             services.MAX_RETRY_AFTER + services.RETRY_JITTER)
+
+    def test_backoff_without_retry_after(self):
+        delay = services._retry_delay(httpx.Response(502), 2)
+
+        self.assertGreaterEqual(delay, services.RETRY_BACKOFF_FACTOR * 4)
+        self.assertLessEqual(
+            delay, services.RETRY_BACKOFF_FACTOR * 4 + services.RETRY_JITTER)
+
+
+class GetStockPredictionsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.closes = {
+            'AAPL': [1.0] * services.SEQUENCE_LENGTH,
+            'MSFT': [2.0] * services.SEQUENCE_LENGTH,
+        }
+        # AAPL and MSFT share one model, so they run in a single batch.
+        self.predictor = mock.Mock()
+        self.predictor.predict_many.return_value = [0.9, 0.2]
+
+        for patcher in (
+                mock.patch.object(services, '_fetch_recent_closes',
+                                  self._fetch_recent_closes),
+                mock.patch.object(services,
+                                  'get_predictor',
+                                  return_value=self.predictor),
+                mock.patch.object(services,
+                                  'get_shared_predictor',
+                                  return_value=None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _fetch_recent_closes(self, symbol):
+        if symbol not in self.closes:
+            return None, {
+                'symbol': symbol,
+                'error': 'Analysis failed due to data error'
+            }
+        return self.closes[symbol], None
+
+    def test_mixed_request_keeps_request_order(self):
+        results = services.get_stock_predictions(
+            ['msft', 'TSLA', 'GOOGL', 'AAPL'])
+
+        self.predictor.predict_many.assert_called_once_with(
+            [self.closes['MSFT'], self.closes['AAPL']])
+        self.assertEqual([r['symbol'] for r in results],
+                         ['MSFT', 'TSLA', 'GOOGL', 'AAPL'])
+        self.assertEqual(results[0]['prediction'], 'BULLISH')
+        self.assertEqual(results[0]['raw_score'], 0.9)
+        self.assertEqual(results[1]['error'],
+                         'Model not available for this stock (Check models/)')
+        self.assertEqual(results[2]['error'],
+                         'Analysis failed due to data error')
+        self.assertEqual(results[3]['prediction'], 'BEARISH')
+        self.assertEqual(results[3]['raw_score'], 0.2)
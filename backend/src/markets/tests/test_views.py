@@ -0,0 +1,102 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from markets import views
+from markets.schemas import Quote, QuoteError
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+QUOTES = [
+    Quote(symbol='AAPL',
+          name='Apple Inc.',
+          price=110.0,
+          change_amount=10.0,
+          change_percent=10.0),
+    QuoteError(symbol='UNKNOWN', error='Data unavailable'),
+]
+
+
+class _AuthenticatedView(views.AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, _request):
+        return Response({'ok': True})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncLiveStockPricesAPIViewTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.view = views.AsyncLiveStockPricesAPIView.as_view()
+
+    async def _get(self, view, path='/api/markets/live-prices/', **params):
+        response = await view(self.factory.get(path, params))
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    async def test_returns_quotes(self):
+        with mock.patch.object(views,
+                               'aget_live_prices',
+                               new=mock.AsyncMock(return_value=QUOTES)) as get:
+            response = await self._get(self.view, tickers='AAPL,UNKNOWN')
+
+        get.assert_awaited_once_with(['AAPL', 'UNKNOWN'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('max-age=10', response['Cache-Control'])
+        self.assertEqual(json.loads(response.content), [{
+            'symbol': 'AAPL',
+            'name': 'Apple Inc.',
+            'price': 110.0,
+            'changeAmount': 10.0,
+            'changePercent': 10.0,
+            'stale': False,
+        }, {
+            'symbol': 'UNKNOWN',
+            'error': 'Data unavailable',
+        }])
+
+    async def test_upstream_unavailable(self):
+        with mock.patch.object(views,
+                               'aget_live_prices',
+                               new=mock.AsyncMock(return_value=None)):
+            response = await self._get(self.view, tickers='AAPL')
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(json.loads(response.content), [{
+            'error': 'External API Unavailable'
+        }])
+
+    async def test_missing_tickers(self):
+        response = await self._get(self.view)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content),
+                         {'error': 'No tickers provided.'})
+
+    async def test_method_not_allowed(self):
+        request = self.factory.post('/api/markets/live-prices/')
+        response = await self.view(request)
+        response.render()
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_permission_denied_in_initial(self):
+        response = await self._get(_AuthenticatedView.as_view())
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.urls import path
 
-from markets.views import LiveStockPricesAPIView
+from markets.views import AsyncLiveStockPricesAPIView, LiveStockPricesAPIView
+
+live_prices_view = (AsyncLiveStockPricesAPIView
+                    if settings.ASYNC_LIVE_PRICES else LiveStockPricesAPIView)
 
 urlpatterns = [
-    path('live-prices/', LiveStockPricesAPIView.as_view(), name='live-prices'),
+    path('live-prices/', live_prices_view.as_view(), name='live-prices'),
 ]
@@ -1,8 +1,64 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+import msgspec
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from markets.services import get_live_prices
+from markets.services import (LIVE_PRICES_CACHE_TIMEOUT, aget_live_prices,
+                              get_live_prices)
+
+
+class AsyncAPIView(APIView):
+    # APIView.dispatch cannot await handlers. Authentication, permissions and
+    # throttling stay synchronous, so they run in a worker thread.
+
+    # pylint: disable-next=invalid-overridden-method
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(),
+                                  self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args,
+                                               **kwargs)
+        return self.response
+
+
+def _live_prices_response(data):
+    if data is None:
+        error = [{'error': 'External API Unavailable'}]
+        return Response(error, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    # The quotes are msgspec structs, encoded straight to bytes without going
+    # through DRF's renderers.
+    response = HttpResponse(msgspec.json.encode(data),
+                            content_type='application/json',
+                            status=status.HTTP_200_OK)
+    patch_cache_control(response,
+                        public=True,
+                        max_age=LIVE_PRICES_CACHE_TIMEOUT)
+    return response
 
 
 class LiveStockPricesAPIView(APIView):
@@ -17,7 +73,19 @@ class LiveStockPricesAPIView(APIView):
         ticker_list = tickers_param.split(',')
         data = get_live_prices(ticker_list)
 
-        if data and 'error' in data[0] and len(data) == 1:
-            return Response(data, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return _live_prices_response(data)
+
+
+class AsyncLiveStockPricesAPIView(AsyncAPIView):
+
+    async def get(self, request):
+        tickers_param = request.query_params.get('tickers')
+
+        if not tickers_param:
+            return Response({'error': 'No tickers provided.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ticker_list = tickers_param.split(',')
+        data = await aget_live_prices(ticker_list)
 
-        return Response(data, status=status.HTTP_200_OK)
+        return _live_prices_response(data)
@@ -10,6 +10,7 @@ interface StockQuote {
     changeAmount: number | null;
     changePercent: number | null;
     error?: string;
+    stale?: boolean;
 }
 
 interface StockCardProps {
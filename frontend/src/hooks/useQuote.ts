@@ -11,6 +11,7 @@ interface StockQuote {
     changeAmount: number | null;
     changePercent: number | null;
     error?: string; // Optional error field for individual tickers
+    stale?: boolean; // Set when the backend served a last known quote
 }
 
 /**